@@ -2,7 +2,7 @@ import os
 import shutil
 import argparse
 import subprocess
-import math
+import threading
 import tempfile
 import tarfile
 import platform
@@ -13,6 +13,16 @@ WIDTH = 1920
 HEIGHT = 1080
 PIXELS_PER_FRAME = WIDTH * HEIGHT
 BYTES_PER_FRAME = PIXELS_PER_FRAME * 3  # RGB24
+# zstd level tiers by input size: archival for small inputs, faster levels for big ones
+ZSTD_LEVEL_TIERS = ((100 * 1024 * 1024, 19), (2 * 1024 ** 3, 15))
+ZSTD_LEVEL_LARGE = 10
+ZSTD_LONG_MIN_SIZE = 128 * 1024 * 1024  # Below this, zstd's default window is enough
+VIDEO_CODECS = ('rawvideo', 'ffv1')
+MAX_FFV1_SLICES = 24  # ~256 KiB of RGB24 per slice at 1080p
+PIPE_CHUNK_SIZE = 1 << 20  # 1 MiB reads/writes when streaming through pipes
+ZERO_CHUNK = bytes(PIPE_CHUNK_SIZE)  # Shared zero buffer for frame padding
+COPY_CHUNK_SIZE = 4 << 20  # 4 MiB per copy call when draining a pipe into a file
+FILE_BUFFER_SIZE = 8 << 20  # 8 MiB buffers for multi-GB zst files
 
 
 def get_tool_name(tool):
@@ -23,9 +33,54 @@ def get_tool_name(tool):
             return 'ffmpeg.exe'
         elif tool == 'zstd':
             return 'zstd.exe'
+        elif tool == 'tar':
+            return 'tar.exe'
     return tool
 
 
+def get_ffv1_slices():
+    """Pick an FFV1 slice count so every CPU core gets a slice to encode"""
+    # FFV1 only accepts h*v slice grids with v <= h < 2*v
+    valid = sorted({h * v for v in range(1, 8) for h in range(v, 2 * v)})
+    target = min(max(os.cpu_count() or 4, 4), MAX_FFV1_SLICES)
+    return max(n for n in valid if n <= target)
+
+
+def copy_bytes(src, dst, count):
+    """Copy up to count bytes from src to dst, returning how many were copied"""
+    copied = 0
+    if hasattr(os, 'splice'):
+        # Linux: move pipe data into the file inside the kernel, skipping userspace
+        try:
+            while copied < count:
+                n = os.splice(src.fileno(), dst.fileno(), min(COPY_CHUNK_SIZE, count - copied))
+                if n == 0:
+                    break
+                copied += n
+            return copied
+        except OSError:
+            # Neither end is a pipe or the filesystem can't splice; fall back below
+            if copied:
+                raise
+
+    while copied < count:
+        chunk = src.read(min(COPY_CHUNK_SIZE, count - copied))
+        if not chunk:
+            break
+        dst.write(chunk)
+        copied += len(chunk)
+    return copied
+
+
+def write_zero_padding(stream, count):
+    """Write count zero bytes to stream without allocating a pad buffer"""
+    zeros = memoryview(ZERO_CHUNK)
+    while count > 0:
+        n = min(count, len(zeros))
+        stream.write(zeros[:n])
+        count -= n
+
+
 def check_tools():
     """Check if required tools are available, with platform-specific handling"""
     required_tools = ['ffmpeg', 'zstd']
@@ -59,132 +114,335 @@ def check_tools():
         raise RuntimeError(f"Required tools not found: {', '.join(missing_tools)}")
 
 
-def compress_folder_to_zst(folder_path, output_file):
-    """Compress folder using Python's tarfile module and zstd"""
-    folder_path = Path(folder_path)
-    output_file = Path(output_file)
-    
-    # Create temporary tar file - delete=False but we'll manage it ourselves
-    temp_tar_fd, temp_tar_name = tempfile.mkstemp(suffix='.tar')
-    temp_tar_path = Path(temp_tar_name)
-    
-    try:
-        # Close the file descriptor since we just need the path
-        os.close(temp_tar_fd)
-        
-        print(f"[📦] Creating TAR archive from folder '{folder_path}'")
-        
-        # Use Python's tarfile module for cross-platform compatibility
-        with tarfile.open(temp_tar_path, 'w') as tar:
-            # Add all files in the folder
-            for item in folder_path.rglob('*'):
-                if item.is_file():
-                    # Calculate relative path for cross-platform compatibility
-                    arcname = item.relative_to(folder_path)
-                    tar.add(item, arcname=arcname)
-        
-        print(f"[🗜️] Compressing TAR with zstd to '{output_file}'")
-        
-        # Ensure output directory exists
-        output_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Use zstd to compress - force overwrite with -f flag
-        zstd_cmd = [get_tool_name('zstd'), '-19', '--long=31', '-T0', str(temp_tar_path), '-o', str(output_file), '-f']
-        subprocess.run(zstd_cmd, check=True)
-        
-    finally:
-        # Clean up temporary tar file
-        if temp_tar_path.exists():
-            temp_tar_path.unlink()
+def iter_files(dir_path, arc_prefix=''):
+    """Recursively yield (DirEntry, arcname) for every file under dir_path"""
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            arcname = os.path.join(arc_prefix, entry.name)
+            # DirEntry caches the type from readdir, so no extra stat per entry
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files(entry.path, arcname)
+            elif entry.is_file():
+                yield entry, arcname
 
 
-def decompress_zst_to_folder(zst_file, output_folder):
-    """Decompress zst file to folder using cross-platform methods"""
-    zst_file = Path(zst_file)
-    output_folder = Path(output_folder)
-    
-    # Create temporary tar file - delete=False but we'll manage it ourselves
-    temp_tar_fd, temp_tar_name = tempfile.mkstemp(suffix='.tar')
-    temp_tar_path = Path(temp_tar_name)
-    
+def normalize_ext(ext):
+    """Lower-case an extension such as 'MP4' or '.tar.gz' and give it a leading dot"""
+    ext = ext.strip().lower()
+    if ext.strip('.') == '':
+        raise ValueError(f"Invalid extension to exclude: {ext!r}")
+    return ext if ext.startswith('.') else '.' + ext
+
+
+def exclude_ext_arg(value):
+    """argparse type for --exclude-ext"""
     try:
-        # Close the file descriptor since we just need the path
-        os.close(temp_tar_fd)
-        
-        print(f"[🗜️] Decompressing '{zst_file}' to TAR")
-        
-        # Decompress with zstd - force overwrite with -f flag
-        zstd_cmd = [get_tool_name('zstd'), '--long=31', '-d', str(zst_file), '-o', str(temp_tar_path), '-f']
-        subprocess.run(zstd_cmd, check=True)
-        
-        print(f"[📂] Extracting TAR to folder '{output_folder}'")
-        
-        # Create output directory
-        output_folder.mkdir(parents=True, exist_ok=True)
-        
-        # Extract using Python's tarfile module
-        with tarfile.open(temp_tar_path, 'r') as tar:
+        return normalize_ext(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def scan_folder(folder_path, exclude_exts=()):
+    """List the files to archive and their total size in bytes, skipping excluded extensions"""
+    # Suffix match so multi-part extensions like .tar.gz work too
+    exclude_exts = tuple(normalize_ext(ext) for ext in exclude_exts)
+    files = []
+    skipped = skipped_size = 0
+    for entry, arcname in iter_files(folder_path):
+        if exclude_exts and entry.name.lower().endswith(exclude_exts):
+            skipped += 1
+            skipped_size += entry.stat().st_size
+        else:
+            files.append((entry, arcname))
+    if skipped:
+        print(f"[🚫] Excluding {skipped} files ({skipped_size / (1024 * 1024):.1f} MiB) by extension")
+
+    # Archive in inode order so data blocks are read mostly sequentially
+    files.sort(key=lambda item: item[0].inode())
+    total_size = sum(entry.stat().st_size for entry, _ in files)
+    return files, total_size
+
+
+def write_tar(folder_path, files, stream):
+    """Write files as a tar archive to a pipe, preferring the system tar over tarfile"""
+    tar_path = shutil.which(get_tool_name('tar'))
+    if tar_path is None:
+        # Streaming mode ('w|') never seeks, so the tar can go straight into a pipe;
+        # a large bufsize replaces tarfile's 10 KiB records with 1 MiB pipe writes
+        with tarfile.open(fileobj=stream, mode='w|', bufsize=PIPE_CHUNK_SIZE) as tar:
+            for entry, arcname in files:
+                tar.add(entry.path, arcname=arcname)
+        return
+
+    # tar writes straight into the pipe; names go in on stdin, in our inode order.
+    # The ./ prefix stops names starting with '-' from being parsed as options.
+    tar_cmd = [tar_path, '-cf', '-', '-C', str(folder_path), '--null', '-T', '-']
+    names = b''.join(os.fsencode(os.path.join(os.curdir, arcname)) + b'\0' for _, arcname in files)
+    # COPYFILE_DISABLE stops macOS bsdtar adding AppleDouble ._* entries for extended attributes
+    env = dict(os.environ, COPYFILE_DISABLE='1')
+    proc = subprocess.Popen(tar_cmd, stdin=subprocess.PIPE, stdout=stream, env=env)
+    try:
+        proc.communicate(names)
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, tar_cmd)
+
+
+def extract_tar(stream, output_folder):
+    """Extract a tar archive from a pipe, preferring the system tar over tarfile"""
+    tar_path = shutil.which(get_tool_name('tar'))
+    if tar_path is None:
+        # Extract using Python's tarfile module in streaming mode
+        with tarfile.open(fileobj=stream, mode='r|', bufsize=PIPE_CHUNK_SIZE) as tar:
             tar.extractall(output_folder)
-            
-    finally:
-        # Clean up temporary tar file
-        if temp_tar_path.exists():
-            temp_tar_path.unlink()
+        return
 
+    tar_cmd = [tar_path, '-xf', '-', '-C', str(output_folder)]
+    subprocess.run(tar_cmd, stdin=stream, check=True)
 
-def encode_zst_to_video(zst_file, video_file, meta_file):
-    """Encode zst file to video using cross-platform paths"""
-    zst_file = Path(zst_file)
-    video_file = Path(video_file)
-    meta_file = Path(meta_file)
-    
-    with open(zst_file, 'rb') as f:
-        data = f.read()
 
-    original_size = len(data)
-    num_frames = math.ceil(original_size / BYTES_PER_FRAME)
-    padded = data + b'\x00' * (BYTES_PER_FRAME * num_frames - original_size)
+def split_pipeline_threads(codec):
+    """Split CPU cores between zstd and ffmpeg when both compress at once; 0 means all cores"""
+    if codec != 'ffv1':
+        # Storing raw frames costs ffmpeg next to nothing, so zstd keeps every core
+        return 0, 0
+    cpus = os.cpu_count() or 4
+    zstd_threads = max(1, cpus // 2)
+    return zstd_threads, max(1, cpus - zstd_threads)
+
 
-    # Create temporary raw file
-    with tempfile.NamedTemporaryFile(suffix='.rgb', delete=False) as temp_raw:
-        raw_file = Path(temp_raw.name)
-        temp_raw.write(padded)
+def pick_zstd_level(total_size):
+    """Pick a zstd level for the input size; level 19 is far too slow for multi-GiB inputs"""
+    for max_size, level in ZSTD_LEVEL_TIERS:
+        if total_size < max_size:
+            return level
+    return ZSTD_LEVEL_LARGE
 
+
+def zstd_level_args(level):
+    """Command-line flags selecting a zstd level"""
+    # Levels above 19 are only unlocked with --ultra
+    return ['--ultra', f'-{level}'] if level > 19 else [f'-{level}']
+
+
+def zstd_compress_cmd(total_size, dict_file=None, level=None, threads=0):
+    """Build the zstd compression command, without input/output arguments"""
+    if level is None:
+        level = pick_zstd_level(total_size)
+    zstd_cmd = [get_tool_name('zstd')] + zstd_level_args(level) + [f'-T{threads}']
+    # Long-range matching only pays off on big archives; it costs a 2 GiB window otherwise
+    if total_size >= ZSTD_LONG_MIN_SIZE:
+        zstd_cmd.append('--long=31')
+    if dict_file is not None:
+        zstd_cmd += ['-D', str(dict_file)]
+    return zstd_cmd
+
+
+def train_zstd_dict(files, total_size, dict_file, level=None):
+    """Train a zstd dictionary on the files being archived, returning whether it succeeded"""
+    dict_file = Path(dict_file)
+
+    if level is None:
+        level = pick_zstd_level(total_size)
+
+    print(f"[📚] Training zstd dictionary '{dict_file}' on {len(files)} files")
+
+    # Ensure output directory exists
+    dict_file.parent.mkdir(parents=True, exist_ok=True)
+
+    # Train on exactly the archived files; a list file avoids command-line length limits
+    list_fd, list_name = tempfile.mkstemp(suffix='.txt')
+    list_path = Path(list_name)
     try:
-        # Write metadata
-        with open(meta_file, 'w') as meta:
-            meta.write(f"{original_size}\n{num_frames}\n")
+        with os.fdopen(list_fd, 'w') as list_file:
+            list_file.writelines(f"{entry.path}\n" for entry, _ in files)
 
-        print(f"[🎞️] Encoding {num_frames} frames to video '{video_file}'")
-        
-        # Ensure output directory exists
-        video_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Build ffmpeg command with cross-platform paths
-        ffmpeg_cmd = [
-            get_tool_name('ffmpeg'),
-            '-f', 'rawvideo',
-            '-pixel_format', 'rgb24',
-            '-video_size', f'{WIDTH}x{HEIGHT}',
-            '-framerate', '30',
-            '-i', str(raw_file),
+        # Optimise the dictionary for the level it will be used at; fastcover keeps training quick
+        zstd_cmd = ([get_tool_name('zstd'), '--train', '--filelist', str(list_path)] + zstd_level_args(level) +
+                    ['-T0', '--train-fastcover=accel=5', '-o', str(dict_file), '-f'])
+        subprocess.run(zstd_cmd, check=True)
+    except subprocess.CalledProcessError:
+        # Too few or too small samples is normal input; compress without a dictionary instead
+        print(f"[⚠️] zstd could not train a dictionary on these files; encoding without '{dict_file}'")
+        return False
+    finally:
+        list_path.unlink()
+    return True
+
+
+def video_encode_cmd(video_file, codec='rawvideo', threads=0):
+    """Build the ffmpeg command encoding raw RGB frames from stdin to a Matroska video"""
+    ffmpeg_cmd = [
+        get_tool_name('ffmpeg'),
+        '-f', 'rawvideo',
+        '-pixel_format', 'rgb24',
+        '-video_size', f'{WIDTH}x{HEIGHT}',
+        '-framerate', '30',
+        '-i', 'pipe:0',
+    ]
+    if codec == 'ffv1':
+        ffmpeg_cmd += [
             '-c:v', 'ffv1',
             '-level', '3',
             '-g', '1',
             '-coder', '1',
             '-context', '1',
-            '-slices', '4',
-            str(video_file),
-            '-y'
+            '-slices', str(get_ffv1_slices()),
+            '-slicecrc', '0',
+            '-threads', str(threads),
         ]
-        
-        subprocess.run(ffmpeg_cmd, check=True)
-        print(f"[✅] Video written to {video_file}")
-        
-    finally:
-        # Clean up temporary raw file
-        if raw_file.exists():
-            raw_file.unlink()
+    else:
+        # zstd output is already incompressible, so store the frames untouched
+        ffmpeg_cmd += ['-c:v', 'rawvideo']
+    # Leave out encoder/muxer version tags and random UIDs so identical input gives identical files
+    ffmpeg_cmd += ['-flags', '+bitexact', '-fflags', '+bitexact']
+    ffmpeg_cmd += ['-f', 'matroska', str(video_file), '-y']
+    return ffmpeg_cmd
+
+
+def pump_with_padding(src, dst):
+    """Copy src to dst, zero-pad the last frame and return the unpadded size"""
+    size = 0
+    while True:
+        chunk = src.read(PIPE_CHUNK_SIZE)
+        if not chunk:
+            break
+        dst.write(chunk)
+        size += len(chunk)
+
+    num_frames = (size + BYTES_PER_FRAME - 1) // BYTES_PER_FRAME
+    write_zero_padding(dst, BYTES_PER_FRAME * num_frames - size)
+    return size
+
+
+def write_meta(meta_file, original_size, dict_file=None):
+    """Write the metadata needed to strip frame padding and decompress on decode"""
+    num_frames = (original_size + BYTES_PER_FRAME - 1) // BYTES_PER_FRAME
+    with open(meta_file, 'w') as meta:
+        meta.write(f"{original_size}\n{num_frames}\n")
+        if dict_file is not None:
+            # Absolute, so decoding works from any working directory
+            meta.write(f"{Path(dict_file).resolve()}\n")
+    return num_frames
+
+
+def read_meta(meta_file):
+    """Read the original zst size and optional dictionary path from a meta file"""
+    with open(meta_file, 'r') as meta:
+        lines = meta.read().strip().split('\n')
+    original_size = int(lines[0])
+    dict_file = Path(lines[2]) if len(lines) > 2 else None
+    return original_size, dict_file
+
+
+def decompress_zst_to_folder(zst_file, output_folder, dict_file=None):
+    """Decompress zst file to folder by streaming zstd output into tar"""
+    zst_file = Path(zst_file)
+    output_folder = Path(output_folder)
+
+    print(f"[🗜️] Decompressing '{zst_file}' and extracting to folder '{output_folder}'")
+
+    # Create output directory
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    zstd_cmd = [get_tool_name('zstd'), '-d', '-T0', '--long=31', '-c', str(zst_file)]
+    if dict_file is not None:
+        zstd_cmd += ['-D', str(dict_file)]
+
+    proc = subprocess.Popen(zstd_cmd, stdout=subprocess.PIPE, bufsize=PIPE_CHUNK_SIZE)
+    try:
+        extract_tar(proc.stdout, output_folder)
+        proc.stdout.close()
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, zstd_cmd)
+
+
+def encode_folder_to_video(folder_path, video_file, meta_file, codec='rawvideo', dict_file=None,
+                           level=None, exclude_exts=()):
+    """Compress folder and encode it to video in one pipeline, with no intermediate zst"""
+    folder_path = Path(folder_path)
+    video_file = Path(video_file)
+    meta_file = Path(meta_file)
+
+    files, total_size = scan_folder(folder_path, exclude_exts)
+
+    # First use of a dictionary path: train it on this folder
+    if dict_file is not None and not Path(dict_file).exists():
+        if not train_zstd_dict(files, total_size, dict_file, level):
+            dict_file = None
+
+    print(f"[📦] Archiving folder '{folder_path}' and encoding it to video '{video_file}'")
+
+    # Ensure output directory exists
+    video_file.parent.mkdir(parents=True, exist_ok=True)
+
+    zstd_threads, ffmpeg_threads = split_pipeline_threads(codec)
+    zstd_cmd = zstd_compress_cmd(total_size, dict_file, level, zstd_threads) + ['-c', '-']
+    ffmpeg_cmd = video_encode_cmd(video_file, codec, ffmpeg_threads)
+
+    # tar -> zstd -> ffmpeg: compression and video encoding run concurrently on separate cores
+    ffmpeg_proc = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE, bufsize=PIPE_CHUNK_SIZE)
+    zstd_proc = subprocess.Popen(zstd_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                 bufsize=PIPE_CHUNK_SIZE)
+    result = {}
+
+    def pump():
+        try:
+            result['size'] = pump_with_padding(zstd_proc.stdout, ffmpeg_proc.stdin)
+            ffmpeg_proc.stdin.close()
+        except BaseException as e:
+            result['error'] = e
+            # Unblock the tar writer and stop ffmpeg from waiting on more frames
+            zstd_proc.kill()
+            ffmpeg_proc.kill()
+
+    pump_thread = threading.Thread(target=pump, daemon=True)
+    pump_thread.start()
+
+    tar_error = None
+    try:
+        write_tar(folder_path, files, zstd_proc.stdin)
+        zstd_proc.stdin.close()
+    except (BrokenPipeError, subprocess.CalledProcessError) as e:
+        # tar failed or zstd went away; the exit statuses below say which
+        tar_error = e
+        try:
+            zstd_proc.stdin.close()
+        except BrokenPipeError:
+            pass
+    except BaseException:
+        zstd_proc.kill()
+        ffmpeg_proc.kill()
+        pump_thread.join()
+        zstd_proc.wait()
+        ffmpeg_proc.wait()
+        raise
+
+    pump_thread.join()
+    zstd_proc.wait()
+    ffmpeg_proc.wait()
+
+    error = result.get('error')
+    if error is not None and not isinstance(error, BrokenPipeError):
+        raise error
+    if ffmpeg_proc.returncode != 0:
+        raise subprocess.CalledProcessError(ffmpeg_proc.returncode, ffmpeg_cmd)
+    if zstd_proc.returncode != 0:
+        raise subprocess.CalledProcessError(zstd_proc.returncode, zstd_cmd)
+    if error is not None or tar_error is not None:
+        raise tar_error or error
+
+    num_frames = write_meta(meta_file, result['size'], dict_file)
+    print(f"[✅] Video with {num_frames} frames written to {video_file}")
 
 
 def decode_video_to_zst(video_file, meta_file, output_zst):
@@ -193,62 +451,65 @@ def decode_video_to_zst(video_file, meta_file, output_zst):
     meta_file = Path(meta_file)
     output_zst = Path(output_zst)
     
-    # Create temporary raw file
-    with tempfile.NamedTemporaryFile(suffix='.rgb', delete=False) as temp_raw:
-        raw_file = Path(temp_raw.name)
-
-    try:
-        print(f"[🎬] Decoding video '{video_file}' to raw RGB")
-        
-        # Build ffmpeg command
-        ffmpeg_cmd = [
-            get_tool_name('ffmpeg'),
-            '-i', str(video_file),
-            '-f', 'rawvideo',
-            '-pix_fmt', 'rgb24',
-            str(raw_file),
-            '-y'
-        ]
-        
-        subprocess.run(ffmpeg_cmd, check=True)
-
-        # Read metadata
-        with open(meta_file, 'r') as meta:
-            lines = meta.read().strip().split('\n')
-            original_size = int(lines[0])
+    # Read metadata
+    original_size, _ = read_meta(meta_file)
 
-        # Read and truncate data
-        with open(raw_file, 'rb') as f:
-            data = f.read()
+    print(f"[🎬] Decoding video '{video_file}' to raw RGB")
 
-        restored = data[:original_size]
+    # Ensure output directory exists
+    output_zst.parent.mkdir(parents=True, exist_ok=True)
 
-        # Ensure output directory exists
-        output_zst.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Write restored data
-        with open(output_zst, 'wb') as out:
-            out.write(restored)
+    # Build ffmpeg command writing raw RGB to stdout
+    ffmpeg_cmd = [
+        get_tool_name('ffmpeg'),
+        '-threads', '0',
+        '-i', str(video_file),
+        '-f', 'rawvideo',
+        '-pix_fmt', 'rgb24',
+        'pipe:1'
+    ]
 
-        print(f"[✅] Restored compressed file: {output_zst}")
-        
-    finally:
-        # Clean up temporary raw file
-        if raw_file.exists():
-            raw_file.unlink()
+    proc = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, bufsize=PIPE_CHUNK_SIZE)
+    try:
+        # Copy exactly original_size bytes, dropping the frame padding
+        with open(output_zst, 'wb', buffering=FILE_BUFFER_SIZE) as out:
+            copied = copy_bytes(proc.stdout, out, original_size)
+        # Drain the last frame's zero padding so ffmpeg can finish cleanly
+        while proc.stdout.read(PIPE_CHUNK_SIZE):
+            pass
+        proc.stdout.close()
+    except BaseException:
+        proc.terminate()
+        proc.wait()
+        raise
+
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, ffmpeg_cmd)
+    if copied < original_size:
+        raise RuntimeError(f"Video ended {original_size - copied} bytes short of the expected {original_size} bytes")
+
+    print(f"[✅] Restored compressed file: {output_zst}")
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Convert folders to/from lossless FFV1 video using zstd")
+    parser = argparse.ArgumentParser(description="Convert folders to/from lossless video using zstd")
     subparsers = parser.add_subparsers(dest='command')
 
     enc = subparsers.add_parser('encode', help='Compress folder and encode as video')
     enc.add_argument('folder', help='Input folder to compress and encode')
     enc.add_argument('--out', required=True, help='Output prefix (e.g. out/backup)')
+    enc.add_argument('--codec', choices=VIDEO_CODECS, default='rawvideo',
+                     help='Video codec: rawvideo stores frames as-is, ffv1 re-compresses them (default: rawvideo)')
+    enc.add_argument('--dict', help='zstd dictionary to compress with; trained on the folder if it does not exist')
+    enc.add_argument('--zstd-level', type=int, choices=range(1, 23), metavar='{1-22}',
+                     help='zstd compression level (default: 19 under 100 MiB, 15 under 2 GiB, else 10)')
+    enc.add_argument('--exclude-ext', action='append', default=[], metavar='EXT', type=exclude_ext_arg,
+                     help='Leave out files with this extension, e.g. already-compressed .mp4 (repeatable)')
 
     dec = subparsers.add_parser('decode', help='Decode video and restore original folder')
     dec.add_argument('--out', required=True, help='Prefix used during encode (e.g. out/backup)')
     dec.add_argument('--output-folder', required=True, help='Folder to restore original contents into')
+    dec.add_argument('--dict', help='zstd dictionary to decompress with (default: the one recorded at encode)')
 
     args = parser.parse_args()
     
@@ -262,15 +523,11 @@ def main():
         out_path = Path(args.out)
         video_path = out_path.with_suffix('.mkv')
         meta_path = out_path.with_suffix('.meta')
-        temp_zst = out_path.with_suffix('.zst')
-        
-        try:
-            compress_folder_to_zst(args.folder, temp_zst)
-            encode_zst_to_video(temp_zst, video_path, meta_path)
-        finally:
-            # Clean up temporary zst file
-            if temp_zst.exists():
-                temp_zst.unlink()
+
+        dict_file = Path(args.dict) if args.dict else None
+
+        encode_folder_to_video(args.folder, video_path, meta_path, args.codec, dict_file, args.zstd_level,
+                               args.exclude_ext)
 
     elif args.command == 'decode':
         out_path = Path(args.out)
@@ -280,8 +537,11 @@ def main():
         temp_zst = output_folder.with_suffix('.zst')
 
         try:
+            _, dict_file = read_meta(meta_path)
+            if args.dict:
+                dict_file = Path(args.dict)
             decode_video_to_zst(video_path, meta_path, temp_zst)
-            decompress_zst_to_folder(temp_zst, output_folder)
+            decompress_zst_to_folder(temp_zst, output_folder, dict_file)
         finally:
             # Clean up temporary zst file
             if temp_zst.exists():